@@ -0,0 +1,300 @@
+#!/usr/bin/env python3
+
+# Python script for building delta feeds between consecutive RSS builds
+# Emits only new and changed items so downstream consumers (rd_rss.py) do not
+# have to re-read the full feeds every hour
+
+import json
+import argparse
+import datetime
+import os
+import xml.etree.ElementTree as ET
+
+# SECTION: VARIABLES
+__location__ = os.path.realpath(os.path.join(
+    os.getcwd(), os.path.dirname(__file__)))
+
+# Feeds directory written by index.js
+feeds_dir_name = "feeds"
+feeds_dir_path = os.path.join(__location__, feeds_dir_name)
+
+# Delta files are written as feeds/delta/<feed>.jsonl
+delta_dir_name = "feeds/delta"
+delta_dir_path = os.path.join(__location__, delta_dir_name)
+
+# Fingerprint index of the previous build
+index_file_name = "RDRSSconfig/feed_index.json"
+index_file_path = os.path.join(__location__, index_file_name)
+
+# Feeds to compute deltas for when none are given on the command line
+DEFAULT_FEEDS = [
+    "2160p.xml",
+    "1080p.xml",
+    "720p.xml"
+]
+
+# Number of most recent builds kept in each delta file, so a consumer that
+# misses some runs can still catch up (48 hourly builds = 2 days)
+DELTA_WINDOW = 48
+
+# Variables loaded from file
+_index = {}
+
+
+# SECTION: METHODS
+
+def load_index() -> bool:
+    """Load fingerprint index from file into index variable
+
+    A missing index file is fine (first run), an unreadable one is not, as
+    starting over would report every item of every feed as new.
+
+    @return bool Index is usable
+    """
+    global _index
+    if not os.path.exists(index_file_path):
+        _index = {}
+        return True
+    try:
+        json_file = open(index_file_path, "r", encoding="utf-8")
+        index = json.load(json_file)
+        json_file.close()
+    except Exception:
+        return False
+
+    # Every feed holds its build number and fingerprints of its items
+    if not isinstance(index, dict):
+        return False
+    for feed in index.values():
+        if (not isinstance(feed, dict) or not isinstance(feed.get("build"), int)
+                or not isinstance(feed.get("items"), dict)):
+            return False
+    _index = index
+    return True
+
+
+def store_index() -> bool:
+    """Store fingerprint index to file from index variable
+
+    @return bool Storing was successful
+    """
+
+    try:
+        os.makedirs(os.path.dirname(index_file_path), exist_ok=True)
+        json_file = open(index_file_path, "w", encoding="utf-8")
+        # Compact separators, the index holds one entry per feed guid
+        json.dump(_index, json_file, separators=(",", ":"), sort_keys=True)
+        json_file.close()
+        return True
+    except Exception:
+        return False
+
+
+def enclosure_hash(enclosure_url):
+    """Get fingerprint of an enclosure url
+
+    @param enclosure_url Enclosure url (https://yts.mx/torrent/download/<hash>)
+    @return torrent hash in lowercase, or the full url if it carries no hash
+    """
+    hash_part = enclosure_url.rstrip('/').split('/')[-1]
+    if len(hash_part) == 40:  # SHA1 hash length
+        return hash_part.lower()
+    return enclosure_url
+
+
+def read_feed(feed_path):
+    """Read channel title and items from an RSS feed file
+
+    @param feed_path Path to RSS feed file
+    @return (channel title, list of item dicts)
+    """
+
+    channel = ET.parse(feed_path).getroot().find("channel")
+    if channel is None:
+        raise ET.ParseError("feed has no channel")
+
+    items = []
+    for element in channel.findall("item"):
+        enclosure = element.find("enclosure")
+        enclosure_url = enclosure.get("url", "") if enclosure is not None else ""
+        items.append({
+            "guid": (element.findtext("guid") or element.findtext("link") or "").strip(),
+            "hash": enclosure_hash(enclosure_url) if enclosure_url else "",
+            "title": element.findtext("title") or "",
+            "link": element.findtext("link") or "",
+            "pubDate": element.findtext("pubDate") or "",
+            "enclosure": enclosure_url
+        })
+
+    return (channel.findtext("title") or "").strip(), items
+
+
+def delta_path(feed_file):
+    """Get path of delta file for a feed
+
+    @param feed_file File name of feed inside feeds directory
+    @return path to delta file
+    """
+    return os.path.join(delta_dir_path, os.path.splitext(feed_file)[0] + ".jsonl")
+
+
+def read_delta(path):
+    """Read header and records of a delta file
+
+    @param path Path to delta file
+    @return (header dict, list of record dicts), header is None if file is missing or invalid
+    """
+    try:
+        json_file = open(path, "r", encoding="utf-8")
+        lines = [json.loads(line) for line in json_file if line.strip()]
+        json_file.close()
+    except Exception:
+        return None, []
+    if not lines or not isinstance(lines[0].get("since"), int):
+        return None, []
+    return lines[0], lines[1:]
+
+
+def write_delta(path, header, records) -> bool:
+    """Write delta file, header first and one record per line
+
+    @param path Path to delta file
+    @param header Header dict
+    @param records Record dicts
+    @return bool Writing was successful
+    """
+    tmp_path = path + ".tmp"
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        json_file = open(tmp_path, "w", encoding="utf-8")
+        for line in [header] + records:
+            json_file.write(json.dumps(line, separators=(",", ":")) + "\n")
+        json_file.close()
+        os.replace(tmp_path, path)
+        return True
+    except Exception:
+        return False
+
+
+def build_delta(feed_file, build_date) -> bool:
+    """Compare feed against the previous build and write its delta file
+
+    The delta file starts with a header line holding the feed, the current
+    build number and the oldest build still covered ("since"). Every other
+    line is an added or changed item tagged with the build it appeared in.
+    Consumers remember the last build they processed and read newer records.
+
+    @param feed_file File name of feed inside feeds directory
+    @param build_date Date of this build
+
+    @return bool Delta was written
+    """
+    global _index
+
+    feed_path = os.path.join(feeds_dir_path, feed_file)
+    if not os.path.exists(feed_path):
+        print(f"-> Skipping {feed_file}: feed not found")
+        return False
+
+    try:
+        title, items = read_feed(feed_path)
+    except ET.ParseError as e:
+        print(f"-> Skipping {feed_file}: failed to parse feed ({e})")
+        return False
+
+    previous_feed = _index.get(feed_file)
+    build = previous_feed["build"] + 1 if previous_feed else 1
+    previous = previous_feed["items"] if previous_feed else {}
+    current = {}
+    records = []
+    added_count = 0
+    changed_count = 0
+
+    # A guid can carry several torrents of the same quality (e.g. web and
+    # bluray), so items are keyed by guid plus enclosure hash
+    for item in items:
+        guid = item["guid"]
+        if not guid:
+            continue
+        current.setdefault(guid, [])
+        if item["hash"] not in current[guid]:
+            current[guid].append(item["hash"])
+
+        # Without a previous build there is nothing to compare with, so
+        # the first build only records the baseline
+        if not previous_feed:
+            continue
+        if guid not in previous:
+            added_count += 1
+            records.append(dict(item, build=build, change="added"))
+        elif item["hash"] not in previous[guid]:
+            changed_count += 1
+            records.append(dict(item, build=build, change="changed"))
+
+    # Keep records of recent builds, the window starts over if the
+    # previous delta file is gone
+    path = delta_path(feed_file)
+    since = max(build - DELTA_WINDOW + 1, 1)
+    previous_header, previous_records = read_delta(path) if previous_feed else (None, [])
+    if previous_header is None:
+        since = build
+    else:
+        since = max(since, previous_header["since"])
+    kept = [record for record in previous_records if since <= record.get("build", 0) < build]
+
+    header = {
+        "feed": feed_file,
+        "title": title,
+        "build": build,
+        "since": since,
+        "built": build_date.strftime('%Y-%m-%d %H:%M:%S')
+    }
+    if not write_delta(path, header, kept + records):
+        print(f"-> Skipping {feed_file}: failed to write delta")
+        return False
+    _index[feed_file] = {"build": build, "items": current}
+
+    if previous_feed:
+        print(f"-> {feed_file}: build {build}, {len(items)} items, {added_count} added, {changed_count} changed.")
+    else:
+        print(f"-> {feed_file}: build {build}, {len(items)} items recorded as baseline.")
+    return True
+
+
+def build_deltas(feed_files):
+    """Build delta files for feed files and store the new fingerprint index
+
+    @param feed_files File names of feeds inside feeds directory
+    """
+
+    if not load_index():
+        print(f"Feed index {index_file_name} is invalid. Fix or remove it to start a new baseline.")
+        return
+    build_date = datetime.datetime.utcnow()
+
+    written_count = 0
+    for feed_file in feed_files:
+        if build_delta(feed_file, build_date):
+            written_count += 1
+
+    if written_count > 0:
+        if store_index():
+            print(f"Successfully built {written_count} delta feeds.")
+        else:
+            print("Failed to save feed index.")
+    else:
+        print("No delta feeds built.")
+
+
+# SECTION: ARGUMENT PROCESSING
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build delta feeds between consecutive builds.')
+    parser.add_argument('feeds', type=str, nargs='*', default=DEFAULT_FEEDS,
+                        help='feed file names inside feeds directory (default: %(default)s)')
+    parser.add_argument('-w', '--window', type=int, default=DELTA_WINDOW,
+                        help='number of recent builds kept in each delta file (default: %(default)s)')
+
+    args = parser.parse_args()
+
+    DELTA_WINDOW = max(args.window, 1)
+    build_deltas(args.feeds)
@@ -0,0 +1,525 @@
+#!/usr/bin/env python3
+
+# Compact store for torrent info hashes
+# Keeps 20-byte binary digests in one sorted buffer (optionally mmap'd from
+# disk) instead of a set of 40-character hex strings
+
+import argparse
+import mmap
+import os
+import random
+import shutil
+import struct
+import tempfile
+import time
+import tracemalloc
+
+# SECTION: VARIABLES
+
+DIGEST_SIZE = 20  # SHA1 digest length in bytes
+
+# File layout: magic, digest count, sorted digests
+FILE_MAGIC = b"IHS1"
+FILE_HEADER = struct.Struct("<4sQ")
+
+# Unsorted adds are merged into the sorted buffer once they reach this size
+PENDING_LIMIT = 4096
+
+# Bloom filter sizing
+BLOOM_BITS_PER_HASH = 10
+BLOOM_HASH_COUNT = 7
+
+
+# SECTION: METHODS
+
+def to_digest(torrent_hash):
+    """Convert hex torrent hash to binary digest
+
+    @param torrent_hash 40-character hex hash (as returned by extract_hash_from_magnet)
+    @return 20-byte digest or None if hash is not a hex SHA1 hash
+    """
+    if isinstance(torrent_hash, (bytes, bytearray)):
+        return bytes(torrent_hash) if len(torrent_hash) == DIGEST_SIZE else None
+    try:
+        digest = bytes.fromhex(torrent_hash)
+    except (TypeError, ValueError):
+        return None
+    return digest if len(digest) == DIGEST_SIZE else None
+
+
+class HashStore:
+    """Sorted, array-backed set of torrent info hashes
+
+    Membership costs a binary search over the sorted buffer. An optional
+    Bloom filter in front answers most misses without touching it, but is
+    built in Python from every stored hash, so it is off by default.
+    """
+
+    def __init__(self, hashes=(), use_bloom=False):
+        """Create store
+
+        @param hashes Initial hex hashes or digests
+        @param use_bloom Keep a Bloom filter in front of the sorted buffer
+        """
+        self._data = b""
+        self._base = 0
+        self._count = 0
+        self._pending = set()
+        self._use_bloom = use_bloom
+        self._bloom = None
+        self._bloom_bits = 0
+        self._bloom_capacity = 0
+        self._file = None
+        self._mmap = None
+        self.merge(hashes)
+        self._build_bloom()
+
+    # Loading and storing
+
+    @classmethod
+    def load(cls, path, use_mmap=True, use_bloom=False):
+        """Load store from file
+
+        @param path Path to store file
+        @param use_mmap Map the file instead of reading it into memory
+        @param use_bloom Build a Bloom filter from every stored hash (reads the whole file)
+        @return HashStore, empty if the file does not exist
+        @raise ValueError File is not a valid store file
+        """
+        store = cls(use_bloom=use_bloom)
+        try:
+            store_file = open(path, "rb")
+        except FileNotFoundError:
+            return store
+
+        try:
+            count = cls._read_header(store_file)
+            if use_mmap and count > 0:
+                # Slicing an mmap returns bytes, so records are read in place
+                store._mmap = mmap.mmap(store_file.fileno(), 0, access=mmap.ACCESS_READ)
+                store._file = store_file
+                store._data = store._mmap
+                store._base = FILE_HEADER.size
+            else:
+                store._data = store_file.read(count * DIGEST_SIZE)
+                store_file.close()
+        except Exception:
+            store_file.close()
+            raise
+        store._count = count
+        store._build_bloom()
+        return store
+
+    @staticmethod
+    def _read_header(store_file):
+        """Read and validate store file header
+
+        @param store_file Store file opened for binary reading
+        @return digest count
+        @raise ValueError File is not a valid store file
+        """
+        header = store_file.read(FILE_HEADER.size)
+        if len(header) < FILE_HEADER.size:
+            raise ValueError("store file is truncated")
+        magic, count = FILE_HEADER.unpack(header)
+        if magic != FILE_MAGIC:
+            raise ValueError("store file has an unknown format")
+        if os.fstat(store_file.fileno()).st_size != FILE_HEADER.size + count * DIGEST_SIZE:
+            raise ValueError("store file size does not match its header")
+        return count
+
+    def save(self, path) -> bool:
+        """Store hashes to file
+
+        A mapped store streams its records and pending adds straight into the
+        new file and maps that file afterwards, so the sorted buffer is never
+        copied into memory. The old mapping stays in use until the new file
+        is in place and mapped, so a failed save leaves the store unchanged.
+
+        @param path Path to store file
+        @return bool Storing was successful
+        """
+        tmp_path = path + ".tmp"
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            if self._mmap is None:
+                self.compact()
+            pending = sorted(self._pending)
+
+            with open(tmp_path, "wb") as store_file:
+                store_file.write(FILE_HEADER.pack(FILE_MAGIC, self._count + len(pending)))
+                self._write_merged(pending, store_file.write)
+
+            if self._mmap is None:
+                os.replace(tmp_path, path)
+                return True
+
+            # Replacing a mapped file is fine on POSIX, the old mapping keeps
+            # the previous contents until it is closed
+            os.replace(tmp_path, path)
+            mapped = HashStore.load(path)
+            old_file = self._file
+            old_mmap = self._mmap
+            self._data = mapped._data
+            self._base = mapped._base
+            self._count = mapped._count
+            self._file = mapped._file
+            self._mmap = mapped._mmap
+            self._pending = set()
+            old_mmap.close()
+            old_file.close()
+            return True
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return False
+
+    def close(self):
+        """Release mmap'd file, stored hashes still in the mapping are dropped"""
+        if self._mmap is not None:
+            if self._data is self._mmap:
+                self._data = b""
+                self._base = 0
+                self._count = 0
+            self._mmap.close()
+            self._file.close()
+            self._mmap = None
+            self._file = None
+
+    # Set operations
+
+    def add(self, torrent_hash) -> bool:
+        """Add hash to store
+
+        @param torrent_hash Hex hash or digest
+        @return bool Hash was valid
+        """
+        digest = to_digest(torrent_hash)
+        if digest is None:
+            return False
+        if not self._contains_digest(digest):
+            self._pending.add(digest)
+            self._bloom_include((digest,))
+            if len(self._pending) >= PENDING_LIMIT:
+                self.compact()
+        return True
+
+    def merge(self, hashes):
+        """Bulk merge hashes into store
+
+        @param hashes Iterable of hex hashes, digests or another HashStore
+        """
+        if isinstance(hashes, HashStore):
+            digests = hashes._iter_digests()
+        else:
+            digests = sorted(
+                digest for digest in map(to_digest, hashes) if digest is not None)
+
+        # Only digests not stored yet take part in the merge
+        new = []
+        for digest in digests:
+            if (not new or digest != new[-1]) and not self._contains_digest(digest):
+                new.append(digest)
+        if new:
+            self._bloom_include(new)
+            if self._pending:
+                new = sorted(self._pending.union(new))
+            self._merge_sorted(new)
+            self._pending = set()
+
+    def compact(self):
+        """Merge pending adds into the sorted buffer"""
+        if self._pending:
+            self._merge_sorted(sorted(self._pending))
+            self._pending = set()
+
+    def __contains__(self, torrent_hash):
+        digest = to_digest(torrent_hash)
+        if digest is None:
+            return False
+        return self._contains_digest(digest)
+
+    def __len__(self):
+        return self._count + len(self._pending)
+
+    def __iter__(self):
+        """Iterate stored hashes as lowercase hex"""
+        for digest in self._iter_digests():
+            yield digest.hex()
+
+    # Internals
+
+    def _iter_digests(self):
+        """Iterate stored digests and pending adds in sorted order
+
+        Pending adds are merged in while iterating, so the store (and its
+        mapping) is left untouched.
+        """
+        data = self._data
+        position = self._base
+        for digest in sorted(self._pending):
+            offset = self._base + self._lower_bound(digest) * DIGEST_SIZE
+            for record in range(position, offset, DIGEST_SIZE):
+                yield bytes(data[record:record + DIGEST_SIZE])
+            yield digest
+            position = offset
+        for record in range(position, self._base + self._count * DIGEST_SIZE, DIGEST_SIZE):
+            yield bytes(data[record:record + DIGEST_SIZE])
+
+    def _write_merged(self, digests, write):
+        """Write the sorted buffer merged with sorted digests not stored yet
+
+        Runs of stored records between two new digests are written as one
+        memoryview slice, so a merge costs one binary search per new digest
+        plus block copies, not one Python object per stored hash.
+
+        @param digests Sorted digests not stored yet
+        @param write Function called with each chunk, must not keep it
+        """
+        with memoryview(self._data) as view:
+            position = self._base
+            for digest in digests:
+                offset = self._base + self._lower_bound(digest) * DIGEST_SIZE
+                if offset > position:
+                    write(view[position:offset])
+                write(digest)
+                position = offset
+            end = self._base + self._count * DIGEST_SIZE
+            if end > position:
+                write(view[position:end])
+
+    def _merge_sorted(self, digests):
+        """Merge sorted digests not stored yet into a new sorted buffer"""
+        if not digests:
+            return
+
+        count = self._count + len(digests)
+        buffer = bytearray(count * DIGEST_SIZE)
+        offset = 0
+
+        def write(chunk):
+            nonlocal offset
+            buffer[offset:offset + len(chunk)] = chunk
+            offset += len(chunk)
+
+        self._write_merged(digests, write)
+
+        self.close()
+        self._data = buffer
+        self._base = 0
+        self._count = count
+
+    def _lower_bound(self, digest):
+        """Index of first stored record not less than digest"""
+        data = self._data
+        base = self._base
+        low = 0
+        high = self._count
+        while low < high:
+            middle = (low + high) // 2
+            offset = base + middle * DIGEST_SIZE
+            if data[offset:offset + DIGEST_SIZE] < digest:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def _contains_digest(self, digest):
+        if self._pending and digest in self._pending:
+            return True
+        if self._bloom is not None and not self._bloom_check(digest):
+            return False
+
+        index = self._lower_bound(digest)
+        if index >= self._count:
+            return False
+        offset = self._base + index * DIGEST_SIZE
+        return self._data[offset:offset + DIGEST_SIZE] == digest
+
+    def _bloom_positions(self, digest):
+        # Info hashes are already uniformly distributed, so two 64-bit halves
+        # of the digest drive double hashing
+        first, second = struct.unpack_from("<QQ", digest)
+        second |= 1
+        for i in range(BLOOM_HASH_COUNT):
+            yield (first + i * second) % self._bloom_bits
+
+    def _build_bloom(self):
+        if not self._use_bloom:
+            return
+        # Double the capacity so growing stores rebuild the filter rarely
+        self._bloom_capacity = max(2 * len(self), PENDING_LIMIT)
+        self._bloom_bits = self._bloom_capacity * BLOOM_BITS_PER_HASH
+        self._bloom = bytearray((self._bloom_bits + 7) // 8)
+        for digest in self._iter_digests():
+            self._bloom_add(digest)
+
+    def _bloom_include(self, digests):
+        """Add digests to the Bloom filter, rebuilding it when it is full
+
+        Called before the digests are stored, so a rebuild adds them itself.
+        """
+        if self._bloom is None:
+            return
+        if len(self) + len(digests) > self._bloom_capacity:
+            self._build_bloom()
+        for digest in digests:
+            self._bloom_add(digest)
+
+    def _bloom_add(self, digest):
+        bloom = self._bloom
+        for position in self._bloom_positions(digest):
+            bloom[position >> 3] |= 1 << (position & 7)
+
+    def _bloom_check(self, digest):
+        bloom = self._bloom
+        for position in self._bloom_positions(digest):
+            if not bloom[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+
+def benchmark(count, lookups, additions, use_bloom):
+    """Compare HashStore against a set of hex strings stored as a text file
+
+    Reports held and peak memory (tracemalloc, which does not count mapped
+    file pages) and timings for build, load, adding hashes followed by a
+    save, and lookups.
+
+    @param count Number of stored hashes
+    @param lookups Number of lookups for each of hits and misses
+    @param additions Number of hashes added before saving again
+    @param use_bloom Also benchmark HashStore with a Bloom filter
+    """
+
+    rng = random.Random(0)
+    hashes = ["%040x" % rng.getrandbits(160) for x in range(count)]
+    misses = ["%040x" % rng.getrandbits(160) for x in range(lookups)]
+    new_hashes = ["%040x" % rng.getrandbits(160) for x in range(additions)]
+    hits = rng.sample(hashes, min(lookups, count))
+
+    def save_set(structure, path):
+        with open(path, "w", encoding="utf-8") as text_file:
+            text_file.write("\n".join(structure))
+
+    def load_set(path):
+        with open(path, "r", encoding="utf-8") as text_file:
+            return set(line.rstrip("\n") for line in text_file)
+
+    def update_set(structure, path):
+        structure.update(new_hashes)
+        save_set(structure, path)
+
+    def update_store(structure, path):
+        for torrent_hash in new_hashes:
+            structure.add(torrent_hash)
+        structure.save(path)
+
+    # Strings are rebuilt so the set owns them like a loaded history would
+    candidates = [
+        ("set of str",
+         lambda: set(bytes.fromhex(h).hex() for h in hashes), save_set, load_set, update_set),
+        ("HashStore",
+         lambda: HashStore(hashes), HashStore.save, HashStore.load, update_store),
+    ]
+    if use_bloom:
+        candidates.append(
+            ("HashStore + bloom",
+             lambda: HashStore(hashes, use_bloom=True), HashStore.save,
+             lambda path: HashStore.load(path, use_bloom=True), update_store))
+
+    def measure(func, *args):
+        # Timing and memory are measured in separate runs, tracemalloc slows Python down
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        del result
+        tracemalloc.start()
+        result = func(*args)
+        held, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return result, elapsed, held, peak
+
+    def time_lookups(structure, keys):
+        start = time.perf_counter()
+        for key in keys:
+            key in structure
+        return (time.perf_counter() - start) / max(len(keys), 1) * 1e6
+
+    work_dir = tempfile.mkdtemp()
+    print(f"Benchmark: {count} hashes, {additions} additions, "
+          f"{len(hits)} hit and {len(misses)} miss lookups")
+    print("Memory in MB (held / peak), time in s, lookups in us; mapped file pages are not counted")
+    print(f"{'structure':<18}{'build':>10}{'build mem':>16}{'load':>8}{'load mem':>16}"
+          f"{'add+save':>10}{'add+save mem':>16}{'hit':>8}{'miss':>8}")
+    try:
+        for name, build, save, load, update in candidates:
+            path = os.path.join(work_dir, name.replace(" ", "_"))
+            structure, build_time, build_held, build_peak = measure(build)
+            save(structure, path)
+            del structure
+
+            structure, load_time, load_held, load_peak = measure(load, path)
+            hit_time = time_lookups(structure, hits)
+            miss_time = time_lookups(structure, misses)
+            close = getattr(structure, "close", None)
+            if close:
+                close()
+            del structure
+
+            # Every run starts from the same saved file
+            def load_and_update():
+                loaded = load(path)
+                save(loaded, path + ".copy")
+                loaded = load(path + ".copy")
+                start = time.perf_counter()
+                tracemalloc.start()
+                tracemalloc.reset_peak()
+                update(loaded, path + ".copy")
+                peak = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+                return time.perf_counter() - start, peak
+
+            update_time = load_and_update()[0]
+            update_peak = load_and_update()[1]
+
+            print(f"{name:<18}{build_time:>10.2f}{build_held / 1e6:>8.1f} /{build_peak / 1e6:>6.1f}"
+                  f"{load_time:>8.2f}{load_held / 1e6:>8.1f} /{load_peak / 1e6:>6.1f}"
+                  f"{update_time:>10.2f}{update_peak / 1e6:>16.1f}"
+                  f"{hit_time:>8.2f}{miss_time:>8.2f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+# SECTION: ARGUMENT PROCESSING
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Compact torrent info hash store.')
+    parser.add_argument('-b', '--benchmark', type=int, metavar='COUNT',
+                        help='benchmark store against set of str with COUNT hashes')
+    parser.add_argument('--lookups', type=int, default=100000,
+                        help='number of lookups per benchmark run (default: %(default)s)')
+    parser.add_argument('--additions', type=int, default=100,
+                        help='number of hashes added before saving in benchmark (default: %(default)s)')
+    parser.add_argument('--bloom', action='store_true',
+                        help='also benchmark store with a Bloom filter (slow to build)')
+    parser.add_argument('-f', '--file', type=str,
+                        help='store file to inspect')
+    parser.add_argument('-c', '--check', type=str,
+                        help='check if hash is in store file')
+
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark, args.lookups, args.additions, args.bloom)
+    elif args.file:
+        try:
+            store = HashStore.load(args.file)
+        except ValueError as e:
+            print(f"Invalid store file {args.file}: {e}")
+        else:
+            if args.check:
+                print("Hash found." if args.check in store else "Hash not found.")
+            else:
+                print(f"{len(store)} hashes stored in {args.file}")
+    else:
+        parser.print_help()
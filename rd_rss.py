@@ -13,6 +13,8 @@ import sys
 import time
 import random
 
+from hash_store import HashStore
+
 # Try to load python-dotenv for local development
 try:
     from dotenv import load_dotenv
@@ -29,6 +31,10 @@ __location__ = os.path.realpath(os.path.join(
 save_file_name = "RDRSSconfig/rdrss.json"
 save_file_path = os.path.join(__location__, save_file_name)
 
+# History of torrent hashes already added to Real-Debrid
+history_file_name = "RDRSSconfig/rdhistory.bin"
+history_file_path = os.path.join(__location__, history_file_name)
+
 BASE_DATE_STRING = "2000-01-01 00:00:00"
 
 # Rate limiting and retry configuration
@@ -41,6 +47,7 @@ MAX_RETRY_DELAY = 30  # Maximum retry delay in seconds
 _auth_token = ""
 _data = {}
 _headers = {"Authorization": "Bearer " + _auth_token}
+_history = HashStore()
 
 
 # SECTION: METHODS
@@ -85,6 +92,7 @@ def store_data() -> bool:
 def ready_and_parse():
     """Try to parse RSS urls to Real-Debrid """
     global _data
+    global _history
 
     # Check for token
     if not (token_check()):
@@ -106,16 +114,28 @@ def ready_and_parse():
         print("Missing RSS url. To add RSS url, use --add <value>")
         return
 
+    # Load torrents already added to Real-Debrid
+    try:
+        _history = HashStore.load(history_file_path)
+    except ValueError as e:
+        print(f"Torrent history is invalid ({e}). Fix or remove {history_file_name} to continue.")
+        return
+
     # For each url print info and fetch to Real-Debrid
     x = 0
     for rss in urls:
         x += 1
         print("(" + str(x) + "/" + str(len(urls)) + ") " + rss)
-        parse_feed(rss, last_updated_date)
+        if rss.endswith(".jsonl"):
+            parse_delta(rss, last_updated_date)
+        else:
+            parse_feed(rss, last_updated_date)
 
     # Store now as last update time
     _data["updated"] = datetime.datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
     store_data()
+    if not _history.save(history_file_path):
+        print("Couldn't store torrent history.")
 
     # Select files in Real-Debrid
     select_files()
@@ -126,6 +146,8 @@ def parse_feed(rss_url, last_load_date):
 
     @param rss_url RSS feed url
     @param last_load_date Last date this feed was updated (when to fetch new entries from)
+
+    @return bool Feed had entries
     """
 
     feed = feedparser.parse(rss_url)
@@ -133,13 +155,11 @@ def parse_feed(rss_url, last_load_date):
     # If feed is empty return
     if len(feed.entries) == 0:
         print("-> Fetch from RSS failed. (RSS had no entries)")
-        return
+        return False
 
     # Try to add magnet from each entry that has not yet been added to Real-Debrid
     # based on update time
-    added_count = 0
-    cached_count = 0
-    skipped_count = 0
+    counts = new_counts()
     
     for entry in feed.entries:
         # Check if entry has updated_parsed field and it's newer than last_load_date
@@ -166,16 +186,135 @@ def parse_feed(rss_url, last_load_date):
                         break
             
             if magnet_link:
-                # Check if torrent is cached before adding
-                if check_torrent_cached(magnet_link):
-                    cached_count += 1
-                    if add_magnet(magnet_link):
-                        added_count += 1
-                else:
-                    skipped_count += 1
-                    print("---> Skipping uncached torrent")
+                process_magnet(magnet_link, counts)
+
+    print_counts(counts)
+    return True
+
+
+def parse_delta(delta_url, last_load_date):
+    """Parse delta file written by feed_delta.py into Real-Debrid
+
+    Only records of builds newer than the last processed build of this url
+    are added, so the stored build number works as a cursor. If builds
+    after the cursor already left the delta window, the full feed next to
+    the delta directory is parsed first to catch up on them.
+
+    @param delta_url Delta file url or local path (feeds/delta/<feed>.jsonl)
+    @param last_load_date Last date feeds were updated (used when catching up from the full feed)
+    """
+    global _data
+
+    # Fetch delta file
+    try:
+        if delta_url.startswith("http"):
+            result = requests.get(delta_url, timeout=30)
+            if not result.ok:
+                print(f"-> Fetch from delta failed: {result.status_code}")
+                return
+            lines = result.text.splitlines()
+        else:
+            delta_file = open(delta_url, "r", encoding="utf-8")
+            lines = delta_file.read().splitlines()
+            delta_file.close()
+        records = [json.loads(line) for line in lines if line.strip()]
+        if len(records) == 0:
+            print("-> Fetch from delta failed. (Delta file is empty)")
+            return
+        header = records.pop(0)
+        build = int(header["build"])
+        since = int(header["since"])
+    except Exception as e:
+        print(f"-> Fetch from delta failed. ({e})")
+        return
+
+    if "deltaBuilds" not in _data:
+        _data["deltaBuilds"] = {}
+    cursor = _data["deltaBuilds"].get(delta_url, 0)
+
+    if cursor > build:
+        # Builds were renumbered (feed index rebuilt), start over
+        print(f"-> Delta restarted at build {build}, processing all {len(records)} records")
+        cursor = 0
+    elif 0 < cursor < since - 1:
+        # Items of missed builds are only left in the full feed, torrents
+        # added from it are in the history and skipped below
+        full_url = full_feed_url(delta_url, header.get("feed", ""))
+        print(f"-> Missed builds {cursor + 1}-{since - 1}, catching up from full feed {full_url}")
+        if not full_url or not parse_feed(full_url, last_load_date):
+            print("-> Catching up failed, delta will be processed again next run")
+            return
+
+    counts = new_counts()
+    for record in records:
+        if record.get("build", 0) <= cursor:
+            continue
+        enclosure = record.get("enclosure", "")
+        magnet_link = None
+        if enclosure.startswith('magnet:'):
+            magnet_link = enclosure
+        elif enclosure.startswith('https://yts.mx/torrent/download/'):
+            magnet_link = convert_yts_to_magnet(enclosure)
+        if magnet_link:
+            process_magnet(magnet_link, counts)
+
+    # Remember processed build
+    _data["deltaBuilds"][delta_url] = build
+    print_counts(counts)
+
+
+def full_feed_url(delta_url, feed_file):
+    """Get url of the full feed a delta file was built from
+
+    @param delta_url Delta file url or local path (feeds/delta/<feed>.jsonl)
+    @param feed_file File name of the full feed (from the delta header)
+    @return url of full feed (feeds/<feed_file>) or None if it can't be derived
+    """
+    parts = delta_url.rsplit("/", 2)
+    if len(parts) != 3 or parts[1] != "delta" or not feed_file:
+        return None
+    return parts[0] + "/" + feed_file
+
+
+def new_counts():
+    """Create counters for processed magnets
+
+    @return dict of counters
+    """
+    return {"cached": 0, "added": 0, "skipped": 0, "known": 0}
+
+
+def print_counts(counts):
+    """Print counters for processed magnets
+
+    @param counts Counters created by new_counts
+    """
+    print(f"-> Found {counts['cached']} cached torrents, successfully added {counts['added']} to RD, skipped {counts['skipped']} uncached, {counts['known']} already added.")
 
-    print(f"-> Found {cached_count} cached torrents, successfully added {added_count} to RD, skipped {skipped_count} uncached.")
+
+def process_magnet(magnet_link, counts):
+    """Add magnet to Real-Debrid unless it was already added or is not cached
+
+    @param magnet_link Magnet URI
+    @param counts Counters created by new_counts
+    """
+
+    # Skip torrents that were already added in a previous run
+    torrent_hash = extract_hash_from_magnet(magnet_link)
+    if torrent_hash and torrent_hash in _history:
+        counts["known"] += 1
+        return
+
+    # Check if torrent is cached before adding
+    if check_torrent_cached(magnet_link):
+        counts["cached"] += 1
+        if add_magnet(magnet_link):
+            counts["added"] += 1
+            if torrent_hash:
+                _history.add(torrent_hash)
+    else:
+        counts["skipped"] += 1
+        print("---> Skipping uncached torrent")
 
 
 def convert_yts_to_magnet(torrent_url):
@@ -538,22 +677,33 @@ def auto_add_preferred_feeds():
     base_url = "https://raw.githubusercontent.com/Zero0Q/yts-json-to-rss/refs/heads/main/feeds/"
     
     # List of preferred feed files to add (only high quality feeds)
+    # Delta files only hold what changed since recent builds, so each run
+    # reads a few KB instead of the whole feed
     preferred_feeds = [
-        "2160p.xml"           # 4K content
+        "delta/2160p.jsonl"   # 4K content
 
     ]
     
     added_count = 0
+    removed_count = 0
     for feed_file in preferred_feeds:
         feed_url = base_url + feed_file
+
+        # Replace the full feed the delta was built from
+        full_url = full_feed_url(feed_url, os.path.splitext(os.path.basename(feed_file))[0] + ".xml")
+        if full_url in _data["rssUrls"]:
+            _data["rssUrls"].remove(full_url)
+            removed_count += 1
+            print(f"Removed full RSS feed replaced by its delta: {full_url}")
+
         if feed_url not in _data["rssUrls"]:
             _data["rssUrls"].append(feed_url)
             added_count += 1
             print(f"Added preferred RSS feed: {feed_url}")
     
-    if added_count > 0:
+    if added_count > 0 or removed_count > 0:
         if store_data():
-            print(f"Successfully added {added_count} preferred RSS feeds.")
+            print(f"Successfully added {added_count} and removed {removed_count} preferred RSS feeds.")
         else:
             print("Failed to save RSS feeds.")
     else:
@@ -0,0 +1,223 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import feed_delta
+
+
+def item_xml(slug, torrent_hash, title=None):
+    return (f"<item><title>{title or slug}</title>"
+            f"<link>https://yts.mx/movies/{slug}</link>"
+            f'<guid isPermaLink="false">https://yts.mx/movies/{slug}#1080p</guid>'
+            f"<pubDate>Sun, 20 Jul 2025 03:12:24 GMT</pubDate>"
+            f'<enclosure url="https://yts.mx/torrent/download/{torrent_hash}" '
+            f'length="0" type="application/x-bittorrent"/></item>')
+
+
+@pytest.fixture
+def feeds(tmp_path, monkeypatch):
+    monkeypatch.setattr(feed_delta, "feeds_dir_path", str(tmp_path / "feeds"))
+    monkeypatch.setattr(feed_delta, "delta_dir_path", str(tmp_path / "feeds" / "delta"))
+    monkeypatch.setattr(feed_delta, "index_file_path", str(tmp_path / "RDRSSconfig" / "feed_index.json"))
+    monkeypatch.setattr(feed_delta, "_index", {})
+    os.makedirs(tmp_path / "feeds")
+
+    def write(items, channel_title="<title>YTS 1080p</title>"):
+        with open(tmp_path / "feeds" / "1080p.xml", "w", encoding="utf-8") as feed_file:
+            feed_file.write(f'<?xml version="1.0"?><rss version="2.0"><channel>'
+                            f'{channel_title}{"".join(items)}</channel></rss>')
+    return write
+
+
+def read_delta():
+    return feed_delta.read_delta(feed_delta.delta_path("1080p.xml"))
+
+
+def test_first_build_is_baseline(feeds):
+    feeds([item_xml("a", "A" * 40), item_xml("b", "B" * 40)])
+    feed_delta.build_deltas(["1080p.xml"])
+
+    header, records = read_delta()
+    assert header["build"] == 1
+    assert header["since"] == 1
+    assert header["title"] == "YTS 1080p"
+    assert records == []
+    assert os.path.exists(feed_delta.index_file_path)
+
+
+def test_added_and_changed_items(feeds):
+    feeds([item_xml("a", "A" * 40), item_xml("b", "B" * 40)])
+    feed_delta.build_deltas(["1080p.xml"])
+
+    # Same guid with a second torrent (web and bluray) counts as changed
+    feeds([item_xml("a", "A" * 40), item_xml("b", "B" * 40),
+           item_xml("b", "C" * 40), item_xml("c", "D" * 40)])
+    feed_delta.build_deltas(["1080p.xml"])
+
+    header, records = read_delta()
+    assert header["build"] == 2
+    assert [(r["guid"], r["hash"], r["change"], r["build"]) for r in records] == [
+        ("https://yts.mx/movies/b#1080p", "c" * 40, "changed", 2),
+        ("https://yts.mx/movies/c#1080p", "d" * 40, "added", 2),
+    ]
+    # Original publication date is kept
+    assert records[0]["pubDate"] == "Sun, 20 Jul 2025 03:12:24 GMT"
+
+    # Unchanged build keeps earlier records in the window
+    feed_delta.build_deltas(["1080p.xml"])
+    header, records = read_delta()
+    assert header["build"] == 3
+    assert header["since"] == 1
+    assert len(records) == 2
+
+
+def test_window_drops_old_builds(feeds, monkeypatch):
+    monkeypatch.setattr(feed_delta, "DELTA_WINDOW", 2)
+    feeds([item_xml("a", "A" * 40)])
+    feed_delta.build_deltas(["1080p.xml"])
+    feeds([item_xml("a", "A" * 40), item_xml("b", "B" * 40)])
+    feed_delta.build_deltas(["1080p.xml"])
+    assert len(read_delta()[1]) == 1
+
+    feed_delta.build_deltas(["1080p.xml"])
+    feed_delta.build_deltas(["1080p.xml"])
+    header, records = read_delta()
+    assert header["build"] == 4
+    assert header["since"] == 3
+    assert records == []
+
+
+def test_corrupt_index_is_not_reset(feeds):
+    feeds([item_xml("a", "A" * 40)])
+    os.makedirs(os.path.dirname(feed_delta.index_file_path))
+    with open(feed_delta.index_file_path, "w", encoding="utf-8") as index_file:
+        index_file.write("{not json")
+
+    feed_delta.build_deltas(["1080p.xml"])
+
+    assert not os.path.exists(feed_delta.delta_path("1080p.xml"))
+    with open(feed_delta.index_file_path, "r", encoding="utf-8") as index_file:
+        assert index_file.read() == "{not json"
+
+
+def test_channel_title_is_not_taken_from_items(feeds):
+    feeds([item_xml("a", "A" * 40, title="Movie")], channel_title="")
+    feed_delta.build_deltas(["1080p.xml"])
+    assert read_delta()[0]["title"] == ""
+
+    with open(feed_delta.index_file_path, "r", encoding="utf-8") as index_file:
+        index = json.load(index_file)
+    assert index["1080p.xml"]["items"] == {"https://yts.mx/movies/a#1080p": ["a" * 40]}
+
+
+@pytest.fixture
+def rd(feeds, monkeypatch):
+    pytest.importorskip("requests")
+    pytest.importorskip("feedparser")
+    import rd_rss
+    from hash_store import HashStore
+
+    added = []
+    full_feeds = []
+    monkeypatch.setattr(rd_rss, "_data", {})
+    monkeypatch.setattr(rd_rss, "_history", HashStore())
+    monkeypatch.setattr(rd_rss, "check_torrent_cached", lambda magnet: True)
+    monkeypatch.setattr(rd_rss, "add_magnet", lambda magnet: added.append(magnet) or True)
+    # Test helpers live on the module for the duration of the test
+    monkeypatch.setattr(rd_rss, "added", added, raising=False)
+    monkeypatch.setattr(rd_rss, "full_feeds", full_feeds, raising=False)
+    monkeypatch.setattr(rd_rss, "full_feed_result", True, raising=False)
+
+    def parse_feed(rss_url, last_load_date):
+        full_feeds.append(rss_url)
+        return rd_rss.full_feed_result
+    monkeypatch.setattr(rd_rss, "parse_feed", parse_feed)
+    return rd_rss
+
+
+def write_records(build, since, builds):
+    header = {"feed": "1080p.xml", "build": build, "since": since}
+    records = [{"build": b, "enclosure": "https://yts.mx/torrent/download/" + "%040x" % b}
+               for b in builds]
+    assert feed_delta.write_delta(feed_delta.delta_path("1080p.xml"), header, records)
+
+
+def cursor(rd):
+    return rd._data["deltaBuilds"][feed_delta.delta_path("1080p.xml")]
+
+
+def test_consumer_reads_builds_after_cursor(rd):
+    path = feed_delta.delta_path("1080p.xml")
+    write_records(3, 1, [2, 3])
+    rd.parse_delta(path, None)
+    assert len(rd.added) == 2
+    assert cursor(rd) == 3
+
+    write_records(5, 1, [2, 3, 4, 5])
+    rd.parse_delta(path, None)
+    assert len(rd.added) == 4
+    assert cursor(rd) == 5
+
+    # Nothing new, and re-reading the same build adds nothing
+    rd.parse_delta(path, None)
+    assert len(rd.added) == 4
+    assert rd.full_feeds == []
+
+
+def test_consumer_skips_torrents_in_history(rd):
+    path = feed_delta.delta_path("1080p.xml")
+    write_records(2, 1, [2])
+    rd._history.add("%040x" % 2)
+    rd.parse_delta(path, None)
+    assert rd.added == []
+    assert cursor(rd) == 2
+
+
+def test_consumer_restarts_when_builds_were_renumbered(rd):
+    path = feed_delta.delta_path("1080p.xml")
+    rd._data["deltaBuilds"] = {path: 50}
+    write_records(3, 1, [2, 3])
+    rd.parse_delta(path, None)
+    assert len(rd.added) == 2
+    assert cursor(rd) == 3
+
+
+def test_consumer_catches_up_from_full_feed(rd):
+    path = feed_delta.delta_path("1080p.xml")
+    rd._data["deltaBuilds"] = {path: 5}
+    write_records(60, 13, [13, 60])
+    rd.parse_delta(path, None)
+    assert rd.full_feeds == [os.path.join(feed_delta.feeds_dir_path, "1080p.xml")]
+    assert len(rd.added) == 2
+    assert cursor(rd) == 60
+
+
+def test_consumer_keeps_cursor_when_catching_up_fails(rd):
+    path = feed_delta.delta_path("1080p.xml")
+    rd._data["deltaBuilds"] = {path: 5}
+    rd.full_feed_result = False
+    write_records(60, 13, [13, 60])
+    rd.parse_delta(path, None)
+    assert rd.added == []
+    assert cursor(rd) == 5
+
+
+@pytest.mark.parametrize("content", ["", "\n", "{not json\n", '{"feed":"1080p.xml"}\n'])
+def test_consumer_ignores_invalid_delta(rd, content):
+    path = feed_delta.delta_path("1080p.xml")
+    os.makedirs(os.path.dirname(path))
+    with open(path, "w", encoding="utf-8") as delta_file:
+        delta_file.write(content)
+    rd.parse_delta(path, None)
+    assert rd.added == []
+    assert "deltaBuilds" not in rd._data
+
+
+def test_full_feed_url(rd):
+    assert rd.full_feed_url("https://host/feeds/delta/2160p.jsonl", "2160p.xml") == "https://host/feeds/2160p.xml"
+    assert rd.full_feed_url("https://host/feeds/2160p.jsonl", "2160p.xml") is None
+    assert rd.full_feed_url("https://host/feeds/delta/2160p.jsonl", "") is None
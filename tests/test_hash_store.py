@@ -0,0 +1,182 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import hash_store
+from hash_store import HashStore
+
+
+def random_hashes(count, seed=0):
+    rng = random.Random(seed)
+    return ["%040x" % rng.getrandbits(160) for x in range(count)]
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "bloom"])
+def use_bloom(request):
+    return request.param
+
+
+def test_add_and_merge_deduplicate(use_bloom):
+    hashes = random_hashes(100)
+    store = HashStore(hashes[:50] + hashes[:10], use_bloom=use_bloom)
+    assert len(store) == 50
+
+    for torrent_hash in hashes[40:60]:
+        assert store.add(torrent_hash)
+    assert len(store) == 60
+
+    store.merge(hashes[50:100] + hashes[:5])
+    assert len(store) == 100
+    store.merge(HashStore(hashes[90:]))
+    assert len(store) == 100
+
+    assert sorted(store) == sorted(hashes)
+    assert all(h in store for h in hashes)
+    assert not any(h in store for h in random_hashes(100, seed=1))
+
+
+def test_compaction_keeps_contents(monkeypatch, use_bloom):
+    monkeypatch.setattr(hash_store, "PENDING_LIMIT", 16)
+    hashes = random_hashes(200)
+    store = HashStore(use_bloom=use_bloom)
+    for torrent_hash in hashes:
+        store.add(torrent_hash)
+    assert len(store) == 200
+    assert all(h in store for h in hashes)
+    assert list(store) == sorted(hashes)
+
+
+def test_upper_and_lower_case_are_the_same_hash():
+    torrent_hash = random_hashes(1)[0]
+    store = HashStore([torrent_hash.upper()])
+    assert torrent_hash in store
+    assert torrent_hash.upper() in store
+    assert store.add(torrent_hash)
+    assert len(store) == 1
+    assert list(store) == [torrent_hash]
+
+
+def test_invalid_hashes_are_rejected():
+    store = HashStore(["abc", "zz" * 20, None])
+    assert len(store) == 0
+    assert not store.add("abc")
+    assert not store.add("a" * 32)
+    assert "abc" not in store
+
+
+def test_save_load_round_trip_while_mapped(tmp_path):
+    path = str(tmp_path / "history.bin")
+    hashes = random_hashes(300)
+    assert HashStore(hashes[:100]).save(path)
+
+    store = HashStore.load(path)
+    assert store._mmap is not None
+    assert len(store) == 100
+    for torrent_hash in hashes[100:200]:
+        store.add(torrent_hash)
+    assert store.save(path)
+    assert store._mmap is not None
+    assert len(store) == 200
+
+    # Save again from the remapped file
+    for torrent_hash in hashes[200:]:
+        store.add(torrent_hash)
+    assert store.save(path)
+    assert len(store) == 300
+    assert all(h in store for h in hashes)
+
+    loaded = HashStore.load(path, use_mmap=False)
+    assert loaded._mmap is None
+    assert list(loaded) == sorted(hashes)
+    assert os.path.getsize(path) == hash_store.FILE_HEADER.size + 300 * hash_store.DIGEST_SIZE
+
+
+def test_load_missing_file_is_empty(tmp_path):
+    assert len(HashStore.load(str(tmp_path / "missing.bin"))) == 0
+
+
+def test_load_rejects_truncated_file(tmp_path):
+    path = str(tmp_path / "history.bin")
+    assert HashStore(random_hashes(10)).save(path)
+    with open(path, "rb") as store_file:
+        content = store_file.read()
+
+    with open(path, "wb") as store_file:
+        store_file.write(content[:-1])
+    with pytest.raises(ValueError):
+        HashStore.load(path)
+
+    with open(path, "wb") as store_file:
+        store_file.write(content[:4])
+    with pytest.raises(ValueError):
+        HashStore.load(path)
+
+
+def test_load_rejects_bad_magic(tmp_path):
+    path = str(tmp_path / "history.bin")
+    assert HashStore(random_hashes(10)).save(path)
+    with open(path, "r+b") as store_file:
+        store_file.write(b"XXXX")
+    with pytest.raises(ValueError):
+        HashStore.load(path)
+
+
+def test_compaction_while_mapped(tmp_path, monkeypatch):
+    monkeypatch.setattr(hash_store, "PENDING_LIMIT", 8)
+    path = str(tmp_path / "history.bin")
+    hashes = random_hashes(100)
+    assert HashStore(hashes[:50]).save(path)
+
+    store = HashStore.load(path)
+    for torrent_hash in hashes[50:]:
+        store.add(torrent_hash)
+    assert store._mmap is None
+    assert list(store) == sorted(hashes)
+    assert store.save(path)
+    assert list(HashStore.load(path)) == sorted(hashes)
+
+
+def test_iteration_keeps_store_mapped(tmp_path):
+    path = str(tmp_path / "history.bin")
+    hashes = random_hashes(60)
+    assert HashStore(hashes[:50]).save(path)
+
+    store = HashStore.load(path)
+    for torrent_hash in hashes[50:]:
+        store.add(torrent_hash)
+    assert list(store) == sorted(hashes)
+    assert store._mmap is not None
+    assert len(store._pending) == 10
+
+    other = HashStore(hashes[:5])
+    other.merge(store)
+    assert list(other) == sorted(hashes)
+    assert store._mmap is not None
+
+
+def test_failed_save_keeps_contents(tmp_path, monkeypatch):
+    path = str(tmp_path / "history.bin")
+    hashes = random_hashes(3)
+    assert HashStore(hashes[:2]).save(path)
+
+    store = HashStore.load(path)
+    store.add(hashes[2])
+
+    def failing_replace(source, destination):
+        raise OSError("disk full")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(hash_store.os, "replace", failing_replace)
+        assert not store.save(path)
+
+    assert len(store) == 3
+    assert all(h in store for h in hashes)
+    assert not os.path.exists(path + ".tmp")
+    assert list(HashStore.load(path)) == sorted(hashes[:2])
+
+    assert store.save(path)
+    assert list(HashStore.load(path)) == sorted(hashes)